@@ -0,0 +1,56 @@
+import pyodbc
+from typing import Optional
+import re
+from sync.sql_reader import SQLReader
+
+# أسماء capture instance تُدمج داخل اسم الدالة cdc.fn_cdc_get_all_changes_<instance>
+# لذلك يجب التحقق منها قبل استخدامها في الاستعلام
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+class CDCReader(SQLReader):
+    def __init__(self, db_name: str, host: str, username: str, password: str):
+        """
+        قارئ جداول CDC في SQL Server عبر اتصال واحد دائم بدل فتح اتصال لكل استعلام.
+        ملاحظة: مهمة الالتقاط (capture job) تقرأ سجل المعاملات كل 5 ثوانٍ افتراضياً، فلزمن
+        استجابة أقل من ثانية يجب تقليلها مرة واحدة على الخادم:
+            EXEC sys.sp_cdc_change_job @job_type = N'capture', @pollinginterval = 1;
+        ثم إعادة تشغيل المهمة عبر sys.sp_cdc_stop_job و sys.sp_cdc_start_job.
+        """
+        super().__init__(db_name, host, username, password)
+        self.conn = None
+
+    def _scalar(self, query: str, params: tuple = ()):
+        try:
+            if self.conn is None:
+                self.conn = pyodbc.connect(self.conn_str, autocommit=True, timeout=5)
+            cursor = self.conn.cursor()
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            return row[0] if row else None
+        except pyodbc.Error:
+            self.close()
+            raise
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def get_max_lsn(self) -> Optional[bytes]:
+        return self._scalar("SELECT sys.fn_cdc_get_max_lsn()")
+
+    def get_min_lsn(self, capture_instance: str) -> Optional[bytes]:
+        return self._scalar("SELECT sys.fn_cdc_get_min_lsn(?)", (capture_instance,))
+
+    def increment_lsn(self, lsn: bytes) -> bytes:
+        return self._scalar("SELECT sys.fn_cdc_increment_lsn(?)", (lsn,))
+
+    def has_changes(self, capture_instance: str, from_lsn: bytes, to_lsn: bytes) -> bool:
+        """هل يوجد أي تغيير في المدى [from_lsn, to_lsn]؟ يقرأ صفاً واحداً فقط."""
+        if not _IDENTIFIER.match(capture_instance):
+            raise ValueError(f"❌ اسم capture instance غير صالح: {capture_instance}")
+        query = f"SELECT TOP 1 1 FROM cdc.fn_cdc_get_all_changes_{capture_instance}(?, ?, N'all')"
+        return self._scalar(query, (from_lsn, to_lsn)) is not None
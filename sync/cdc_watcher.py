@@ -0,0 +1,168 @@
+from typing import List, Dict, Optional, Tuple
+import logging
+import threading
+import time
+import json
+import os
+
+# مهلة إعادة المحاولة بعد فشل مزامنة جدول: تبدأ بمدة المؤقت القديم وتتضاعف حتى الحد الأقصى
+RETRY_BACKOFF = 10.0
+MAX_RETRY_BACKOFF = 300.0
+
+def backoff_delay(failures: int) -> float:
+    """مدة الانتظار بعد عدد من مرات الفشل المتتالية."""
+    return min(RETRY_BACKOFF * 2 ** (failures - 1), MAX_RETRY_BACKOFF)
+
+def default_capture_instance(table: str) -> str:
+    """اسم capture instance الافتراضي في SQL Server: schema_table (dbo إن لم يُحدد المخطط)."""
+    parts = table.replace("[", "").replace("]", "").split(".")
+    if len(parts) == 1:
+        parts = ["dbo"] + parts
+    return f"{parts[-2]}_{parts[-1]}"
+
+class LSNCheckpointStore:
+    def __init__(self, path: str = "cdc_checkpoints.json"):
+        """حفظ آخر LSN تمت مزامنته لكل جدول في ملف محلي."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except Exception as e:
+            logging.error(f"🛑 فشل في تحميل نقاط LSN: {e}")
+        return {}
+
+    def get(self, db_name: str, table: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get(f"{db_name}:{table}")
+        return bytes.fromhex(value) if value else None
+
+    def set_many(self, db_name: str, tables: List[str], lsn: bytes):
+        if not tables:
+            return
+        with self._lock:
+            for table in tables:
+                self._data[f"{db_name}:{table}"] = lsn.hex()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, self.path)
+
+    def set(self, db_name: str, table: str, lsn: bytes):
+        self.set_many(db_name, [table], lsn)
+
+class CDCWatcher:
+    def __init__(self, db_name: str, reader, capture_instances: Dict[str, str],
+                 checkpoints: LSNCheckpointStore):
+        """
+        يراقب قاعدة واحدة ويحدد الجداول التي تغيّرت منذ آخر نقطة LSN محفوظة.
+        يُستدعى poll من خيط المراقبة، و commit/fail من الخيط الرئيسي بعد المزامنة.
+        :param capture_instances: قاموس {الجدول المحلي: اسم capture instance}
+        """
+        self.db_name = db_name
+        self.reader = reader
+        self.capture_instances = capture_instances
+        self.checkpoints = checkpoints
+        self.last_max_lsn = None
+        # جداول أُبلغ عنها ولم تنتهِ مزامنتها بعد، فلا يُبلغ عنها مجدداً
+        self.pending = set()
+        self.failures: Dict[str, int] = {}
+        self.retry_at: Dict[str, float] = {}
+        # مهلة مستقلة لفشل الفحص نفسه (خادم غير متاح أو إعداد CDC خاطئ) حتى لا يُعاد كل دورة
+        self.poll_failures = 0
+        self.poll_retry_at = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def poll(self) -> Tuple[List[str], Optional[bytes]]:
+        """
+        فحص واحد: طالما لم يتغير sys.fn_cdc_get_max_lsn() ولا يوجد جدول حان موعد إعادة
+        محاولته لا يُنفَّذ أي استعلام آخر، لذا تكلفة الفحص والقاعدة خاملة قيمة واحدة فقط.
+        بعد فشل الفحص يجب انتظار poll_due() قبل إعادته، بمهلة تتضاعف مع كل فشل متتالٍ.
+        :return: (الجداول التي تغيّرت، أقصى LSN تمت تغطيته)
+        """
+        try:
+            changed, max_lsn = self._poll()
+        except Exception:
+            self.poll_failures += 1
+            self.poll_retry_at = time.monotonic() + backoff_delay(self.poll_failures)
+            raise
+        self.poll_failures = 0
+        self.poll_retry_at = 0.0
+        return changed, max_lsn
+
+    def poll_due(self) -> bool:
+        """هل انتهت مهلة الانتظار بعد آخر فشل للفحص؟"""
+        return time.monotonic() >= self.poll_retry_at
+
+    def _poll(self) -> Tuple[List[str], Optional[bytes]]:
+        max_lsn = self.reader.get_max_lsn()
+        if max_lsn is None:
+            raise RuntimeError(f"CDC غير مفعّل على قاعدة [{self.db_name}]")
+
+        now = time.monotonic()
+        with self._lock:
+            due = any(at <= now for at in self.retry_at.values())
+            if max_lsn == self.last_max_lsn and not due:
+                return [], max_lsn
+            version = self._version
+            candidates = [
+                table for table in self.capture_instances
+                if table not in self.pending and self.retry_at.get(table, 0) <= now
+            ]
+
+        changed, unchanged = [], []
+        for table in candidates:
+            if self._table_changed(table, self.capture_instances[table], max_lsn):
+                changed.append(table)
+            else:
+                unchanged.append(table)
+
+        # الجداول التي لم تتغير تتقدم نقطتها مباشرة حتى يبقى مدى الفحص التالي قصيراً
+        self.checkpoints.set_many(self.db_name, unchanged, max_lsn)
+        with self._lock:
+            for table in candidates:
+                self.retry_at.pop(table, None)
+            self.pending.update(changed)
+            # إذا انتهت مزامنة جدول أثناء الفحص فيجب إعادة الفحص في الدورة القادمة
+            if version == self._version:
+                self.last_max_lsn = max_lsn
+        return changed, max_lsn
+
+    def _table_changed(self, table: str, capture_instance: str, max_lsn: bytes) -> bool:
+        checkpoint = self.checkpoints.get(self.db_name, table)
+        if checkpoint is not None and checkpoint >= max_lsn:
+            return False
+        min_lsn = self.reader.get_min_lsn(capture_instance)
+        if not min_lsn or not any(min_lsn):
+            raise RuntimeError(f"لا يوجد capture instance باسم [{capture_instance}] للجدول [{table}]")
+        if checkpoint is None:
+            # لا توجد نقطة سابقة: يجب تشغيل المزامنة الكاملة مرة واحدة
+            return True
+        from_lsn = self.reader.increment_lsn(checkpoint)
+        if from_lsn < min_lsn:
+            # تم تنظيف جزء من سجل التغييرات قبل مزامنته، لذا نعيد المزامنة للاحتياط
+            return True
+        return self.reader.has_changes(capture_instance, from_lsn, max_lsn)
+
+    def commit(self, table: str, lsn: bytes):
+        """تسجيل نجاح مزامنة الجدول حتى lsn، ثم إعادة فحصه لالتقاط ما تغيّر بعد lsn."""
+        self.checkpoints.set(self.db_name, table, lsn)
+        with self._lock:
+            self.pending.discard(table)
+            self.failures.pop(table, None)
+            self.last_max_lsn = None
+            self._version += 1
+
+    def fail(self, table: str):
+        """تأجيل إعادة محاولة الجدول بعد فشل المزامنة بمهلة تتضاعف مع كل فشل متتالٍ."""
+        with self._lock:
+            self.pending.discard(table)
+            count = self.failures.get(table, 0) + 1
+            self.failures[table] = count
+            self.retry_at[table] = time.monotonic() + backoff_delay(count)
+            self._version += 1
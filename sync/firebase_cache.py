@@ -0,0 +1,137 @@
+from firebase_admin import db
+from collections import OrderedDict
+from typing import Any, Dict, List
+import logging
+import threading
+import time
+import json
+
+# مسار صغير يُستخدم لفحص الاتصال بدل قراءة جذر القاعدة بالكامل
+PROBE_PATH = "test_connection_check"
+
+def estimate_size(data: Any) -> int:
+    """تقدير حجم البيانات بالبايت كما ستُرسل بصيغة JSON."""
+    try:
+        return len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+    except Exception:
+        return len(str(data).encode("utf-8"))
+
+def probe_connection(path: str = PROBE_PATH) -> None:
+    """فحص خفيف للاتصال: قراءة shallow تُرجع المفاتيح فقط دون تنزيل الشجرة. يرفع استثناء عند الفشل."""
+    db.reference(path).get(shallow=True)
+
+def _normalize(path: str) -> str:
+    return "/" + path.strip("/")
+
+def _related(a: str, b: str) -> bool:
+    """هل أحد المسارين أب للآخر أو مساوٍ له؟"""
+    if a == b or a == "/" or b == "/":
+        return True
+    return a.startswith(b + "/") or b.startswith(a + "/")
+
+class _CacheEntry:
+    __slots__ = ("data", "etag", "size", "stored_at")
+
+    def __init__(self, data: Any, etag: str, size: int, stored_at: float):
+        self.data = data
+        self.etag = etag
+        self.size = size
+        self.stored_at = stored_at
+
+class FirebaseReadCache:
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, ttl: float = 30.0):
+        """
+        ذاكرة مؤقتة لقراءات Firebase مع إخلاء LRU حسب الحجم ومدة صلاحية.
+        :param max_bytes: الحد الأقصى لحجم البيانات المخزنة بالبايت
+        :param ttl: مدة صلاحية العنصر بالثواني قبل التحقق منه عبر ETag
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        # لكل مسار يُجلب حالياً: [رقم الجيل، عدد عمليات الجلب الجارية]. يزداد الجيل مع كل
+        # invalidate حتى لا تُخزَّن نتيجة جلب بدأ قبل الكتابة، ويُحذف المسار عند انتهاء آخر جلب
+        self._inflight: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Any:
+        """
+        قراءة مسار مع الاستفادة من الذاكرة المؤقتة.
+        داخل مدة الصلاحية تُرجع النسخة المخزنة مباشرة، وبعدها يُرسل طلب مشروط
+        بالـ ETag فلا تُنزّل البيانات إلا إذا تغيّرت فعلاً.
+        """
+        key = _normalize(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if time.monotonic() - entry.stored_at < self.ttl:
+                    return entry.data
+            slot = self._inflight.setdefault(key, [0, 0])
+            slot[1] += 1
+            generation = slot[0]
+
+        stored = False
+        try:
+            ref = db.reference(key)
+            if entry is not None:
+                changed, data, etag = ref.get_if_changed(entry.etag)
+                if not changed:
+                    with self._lock:
+                        if self._inflight[key][0] == generation:
+                            entry.stored_at = time.monotonic()
+                    logging.debug(f"📦 لم تتغير البيانات في: {key} (ETag)")
+                    return entry.data
+            else:
+                data, etag = ref.get(etag=True)
+
+            stored = True
+            self._store(key, data, etag, generation)
+            return data
+        finally:
+            if not stored:
+                with self._lock:
+                    self._release(key)
+
+    def invalidate(self, path: str):
+        """حذف المسار وكل ما فوقه وتحته من الذاكرة المؤقتة بعد أي كتابة."""
+        key = _normalize(path)
+        with self._lock:
+            for tracked in [p for p in self._inflight if _related(p, key)]:
+                self._inflight[tracked][0] += 1
+            for cached in [p for p in self._entries if _related(p, key)]:
+                self.total_bytes -= self._entries.pop(cached).size
+
+    def clear(self):
+        with self._lock:
+            for slot in self._inflight.values():
+                slot[0] += 1
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _store(self, key: str, data: Any, etag: str, generation: int):
+        size = estimate_size(data)
+        with self._lock:
+            current = self._release(key)
+            if current != generation:
+                logging.debug(f"📦 تم تجاهل نتيجة الجلب من {key} لأن المسار تغيّر أثناء الجلب")
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.size
+            if size > self.max_bytes:
+                logging.debug(f"📦 البيانات في {key} أكبر من حجم الذاكرة المؤقتة ({size} بايت)")
+                return
+            self._entries[key] = _CacheEntry(data, etag, size, time.monotonic())
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.size
+
+    def _release(self, key: str) -> int:
+        """إنهاء جلب جارٍ للمسار وإرجاع جيله الحالي. يُستدعى والقفل مأخوذ."""
+        slot = self._inflight[key]
+        slot[1] -= 1
+        if slot[1] == 0:
+            del self._inflight[key]
+        return slot[0]
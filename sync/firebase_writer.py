@@ -5,6 +5,7 @@ import logging
 import traceback
 import datetime
 import json
+from sync.firebase_cache import FirebaseReadCache, probe_connection
 
 # إعداد الـ logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -35,8 +36,9 @@ def validate_project_id(config_path: str, db_url: str):
         traceback.print_exc()
 
 class FirebaseWriter:
-    def __init__(self, config_path: str, db_url: str):
+    def __init__(self, config_path: str, db_url: str, cache_max_bytes: int = 8 * 1024 * 1024, cache_ttl: float = 30.0):
         """تهيئة الاتصال بـ Firebase."""
+        self.cache = FirebaseReadCache(max_bytes=cache_max_bytes, ttl=cache_ttl)
         try:
             validate_project_id(config_path, db_url)
             if not firebase_admin._apps:
@@ -48,19 +50,11 @@ class FirebaseWriter:
             traceback.print_exc()
 
     def test_connection(self) -> bool:
-        """اختبار الاتصال بـ Firebase عن طريق كتابة وقراءة قيمة تجريبية."""
+        """اختبار الاتصال بـ Firebase عبر قراءة shallow خفيفة بدلاً من كتابة وقراءة قيمة تجريبية."""
         try:
-            path = "test_connection_check"
-            test_data = {"status": "connected", "timestamp": datetime.datetime.now().isoformat()}
-            ref = db.reference(path)
-            ref.set(test_data)
-            result = ref.get()
-            if result and result.get("status") == "connected":
-                logging.info("✅ الاتصال بـ Firebase يعمل بشكل صحيح.")
-                return True
-            else:
-                logging.warning("⚠️ الاتصال تم لكن البيانات غير متطابقة.")
-                return False
+            probe_connection()
+            logging.info("✅ الاتصال بـ Firebase يعمل بشكل صحيح.")
+            return True
         except Exception as e:
             logging.error(f"🛑 فشل اختبار الاتصال: {e}")
             traceback.print_exc()
@@ -74,6 +68,7 @@ class FirebaseWriter:
             logging.info(f"📤 إرسال البيانات إلى ({path}): {data}")
             ref = db.reference(path)
             ref.set(data)
+            self.cache.invalidate(path)
             logging.info(f"✅ تم كتابة البيانات إلى: {path}")
             return True
         except Exception as e:
@@ -88,6 +83,7 @@ class FirebaseWriter:
             data = serialize_data(data)
             ref = db.reference(path)
             new_ref = ref.push(data)
+            self.cache.invalidate(path)
             logging.info(f"🆕 تم إنشاء سجل جديد بالمفتاح: {new_ref.key}")
             return {"key": new_ref.key, "data": data}
         except Exception as e:
@@ -102,6 +98,7 @@ class FirebaseWriter:
             data = serialize_data(data)
             ref = db.reference(path)
             ref.update(data)
+            self.cache.invalidate(path)
             logging.info(f"🔄 تم تحديث البيانات في: {path}")
             return True
         except Exception as e:
@@ -113,6 +110,7 @@ class FirebaseWriter:
         try:
             ref = db.reference(path)
             ref.delete()
+            self.cache.invalidate(path)
             logging.info(f"🗑️ تم حذف البيانات في: {path}")
             return True
         except Exception as e:
@@ -121,9 +119,9 @@ class FirebaseWriter:
             return False
 
     def get_data(self, path: str) -> Dict[str, Any]:
+        """جلب البيانات عبر الذاكرة المؤقتة مع طلب مشروط بالـ ETag عند انتهاء الصلاحية."""
         try:
-            ref = db.reference(path)
-            data = ref.get()
+            data = self.cache.get(path)
             if data is None:
                 logging.info(f"📥 لا توجد بيانات في: {path}")
                 return {}
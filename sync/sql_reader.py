@@ -12,7 +12,7 @@ class SQLReader:
             "TrustServerCertificate=yes;"
         )
 
-    def fetch_query(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    def fetch_query(self, query: str, params: tuple = (), raise_errors: bool = False) -> List[Dict[str, Any]]:
         try:
             with pyodbc.connect(self.conn_str) as conn:
                 cursor = conn.cursor()
@@ -21,5 +21,7 @@ class SQLReader:
                 rows = cursor.fetchall()
                 return [dict(zip(columns, row)) for row in rows]
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"🛑 خطأ في SQL: {e}")
             return []
\ No newline at end of file
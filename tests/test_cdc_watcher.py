@@ -0,0 +1,182 @@
+import sqlite3
+import pytest
+
+from sync.cdc_watcher import CDCWatcher, LSNCheckpointStore, default_capture_instance
+
+def lsn(n):
+    return n.to_bytes(10, "big")
+
+class SQLiteChangeReader:
+    """بديل محلي لدوال CDC: triggers تكتب كل تغيير في جدول cdc_changes برقم تسلسلي يمثل الـ LSN."""
+
+    def __init__(self, tables):
+        self.conn = sqlite3.connect(":memory:")
+        self.queries = 0
+        self.conn.execute("CREATE TABLE cdc_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, instance TEXT)")
+        self.conn.execute("CREATE TABLE cdc_instances (instance TEXT PRIMARY KEY, min_seq INTEGER)")
+        for table in tables:
+            instance = default_capture_instance(table)
+            self.conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, value TEXT)")
+            self.conn.execute("INSERT INTO cdc_instances VALUES (?, 1)", (instance,))
+            for op in ("INSERT", "UPDATE", "DELETE"):
+                self.conn.execute(
+                    f"CREATE TRIGGER {table}_{op.lower()} AFTER {op} ON {table} "
+                    f"BEGIN INSERT INTO cdc_changes (instance) VALUES ('{instance}'); END"
+                )
+
+    def write(self, table, value):
+        self.conn.execute(f"INSERT INTO {table} (value) VALUES (?)", (value,))
+
+    def cleanup(self, instance, min_seq):
+        self.conn.execute("UPDATE cdc_instances SET min_seq = ? WHERE instance = ?", (min_seq, instance))
+
+    def _scalar(self, query, params=()):
+        self.queries += 1
+        row = self.conn.execute(query, params).fetchone()
+        return row[0] if row else None
+
+    def get_max_lsn(self):
+        return lsn(self._scalar("SELECT COALESCE(MAX(seq), 0) FROM cdc_changes"))
+
+    def get_min_lsn(self, capture_instance):
+        value = self._scalar("SELECT min_seq FROM cdc_instances WHERE instance = ?", (capture_instance,))
+        return lsn(value or 0)
+
+    def increment_lsn(self, value):
+        return lsn(int.from_bytes(value, "big") + 1)
+
+    def has_changes(self, capture_instance, from_lsn, to_lsn):
+        return self._scalar(
+            "SELECT 1 FROM cdc_changes WHERE instance = ? AND seq BETWEEN ? AND ? LIMIT 1",
+            (capture_instance, int.from_bytes(from_lsn, "big"), int.from_bytes(to_lsn, "big")),
+        ) is not None
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def reader():
+    reader = SQLiteChangeReader(["Orders", "Items"])
+    reader.write("Orders", "first")
+    return reader
+
+@pytest.fixture
+def checkpoints(tmp_path):
+    return LSNCheckpointStore(str(tmp_path / "cdc_checkpoints.json"))
+
+def make_watcher(reader, checkpoints):
+    capture_instances = {"Orders": "dbo_Orders", "Items": "dbo_Items"}
+    return CDCWatcher("shop", reader, capture_instances, checkpoints)
+
+def commit_all(watcher, tables, max_lsn):
+    for table in tables:
+        watcher.commit(table, max_lsn)
+
+def test_first_poll_reports_every_table(reader, checkpoints):
+    watcher = make_watcher(reader, checkpoints)
+    tables, max_lsn = watcher.poll()
+    assert sorted(tables) == ["Items", "Orders"]
+    assert max_lsn == lsn(1)
+
+def test_idle_poll_only_reads_max_lsn(reader, checkpoints):
+    watcher = make_watcher(reader, checkpoints)
+    commit_all(watcher, *watcher.poll())
+    watcher.poll()
+    reader.queries = 0
+    assert watcher.poll() == ([], lsn(1))
+    assert reader.queries == 1
+
+def test_only_changed_table_is_reported_and_others_advance(reader, checkpoints):
+    watcher = make_watcher(reader, checkpoints)
+    commit_all(watcher, *watcher.poll())
+    reader.write("Items", "new")
+    tables, max_lsn = watcher.poll()
+    assert tables == ["Items"]
+    assert checkpoints.get("shop", "Orders") == max_lsn
+    assert checkpoints.get("shop", "Items") == lsn(1)
+
+def test_pending_table_is_not_reported_again(reader, checkpoints):
+    watcher = make_watcher(reader, checkpoints)
+    commit_all(watcher, *watcher.poll())
+    reader.write("Orders", "a")
+    tables, first_lsn = watcher.poll()
+    assert tables == ["Orders"]
+
+    reader.write("Orders", "b")
+    assert watcher.poll()[0] == []
+
+    # بعد نجاح المزامنة حتى first_lsn يجب التقاط التغيير الذي حدث بعدها
+    watcher.commit("Orders", first_lsn)
+    tables, max_lsn = watcher.poll()
+    assert tables == ["Orders"]
+    assert max_lsn > first_lsn
+
+def test_failed_table_waits_for_backoff(reader, checkpoints, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("sync.cdc_watcher.time.monotonic", lambda: now[0])
+    watcher = make_watcher(reader, checkpoints)
+    commit_all(watcher, *watcher.poll())
+    reader.write("Orders", "a")
+    assert watcher.poll()[0] == ["Orders"]
+
+    watcher.fail("Orders")
+    reader.write("Orders", "b")
+    assert watcher.poll()[0] == []
+    assert checkpoints.get("shop", "Orders") == lsn(1)
+
+    now[0] += 10
+    assert watcher.poll()[0] == ["Orders"]
+
+    watcher.fail("Orders")
+    now[0] += 10
+    assert watcher.poll()[0] == []
+    now[0] += 10
+    assert watcher.poll()[0] == ["Orders"]
+
+def test_cleanup_gap_forces_resync(reader, checkpoints):
+    watcher = make_watcher(reader, checkpoints)
+    commit_all(watcher, *watcher.poll())
+    reader.write("Orders", "a")
+    reader.write("Items", "b")
+    reader.cleanup("dbo_Items", 3)
+    reader.cleanup("dbo_Orders", 3)
+    # تغييرات Orders في المدى 2 حُذفت بالتنظيف، لذا يجب إعادة مزامنته رغم عدم وجود تغيير ظاهر
+    assert sorted(watcher.poll()[0]) == ["Items", "Orders"]
+
+def test_missing_capture_instance_raises(reader, checkpoints):
+    watcher = CDCWatcher("shop", reader, {"Orders": "dbo_Missing"}, checkpoints)
+    with pytest.raises(RuntimeError):
+        watcher.poll()
+
+def test_failed_poll_backs_off_until_due(reader, checkpoints, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("sync.cdc_watcher.time.monotonic", lambda: now[0])
+    watcher = CDCWatcher("shop", reader, {"Orders": "dbo_Missing"}, checkpoints)
+    with pytest.raises(RuntimeError):
+        watcher.poll()
+    assert not watcher.poll_due()
+
+    now[0] += 10
+    assert watcher.poll_due()
+    with pytest.raises(RuntimeError):
+        watcher.poll()
+    now[0] += 10
+    assert not watcher.poll_due()
+    now[0] += 10
+    assert watcher.poll_due()
+
+    # بعد إصلاح الإعداد يعود الفحص طبيعياً وتُصفَّر المهلة
+    watcher.capture_instances = {"Orders": "dbo_Orders"}
+    assert watcher.poll()[0] == ["Orders"]
+    assert watcher.poll_failures == 0
+    assert watcher.poll_due()
+
+def test_checkpoints_persist_to_file(checkpoints):
+    checkpoints.set_many("shop", ["Orders", "Items"], lsn(7))
+    reloaded = LSNCheckpointStore(checkpoints.path)
+    assert reloaded.get("shop", "Orders") == lsn(7)
+    assert reloaded.get("shop", "Missing") is None
+
+def test_default_capture_instance():
+    assert default_capture_instance("Orders") == "dbo_Orders"
+    assert default_capture_instance("[sales].[Orders]") == "sales_Orders"
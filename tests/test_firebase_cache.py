@@ -0,0 +1,132 @@
+import pytest
+
+from sync import firebase_cache
+from sync.firebase_cache import FirebaseReadCache, estimate_size
+
+class FakeReference:
+    """بديل لـ db.Reference يقرأ من قاموس مسطح {المسار: (البيانات، ETag)} ويسجل كل طلب."""
+
+    def __init__(self, server, path):
+        self.server = server
+        self.path = path
+
+    def get(self, etag=False, shallow=False):
+        self.server.calls.append(("get", self.path))
+        self.server.before_response(self.path)
+        data, tag = self.server.values.get(self.path, (None, "empty"))
+        return (data, tag) if etag else data
+
+    def get_if_changed(self, etag):
+        self.server.calls.append(("get_if_changed", self.path))
+        self.server.before_response(self.path)
+        data, tag = self.server.values.get(self.path, (None, "empty"))
+        if tag == etag:
+            return False, None, etag
+        return True, data, tag
+
+class FakeServer:
+    def __init__(self):
+        self.values = {}
+        self.calls = []
+        self.before_response = lambda path: None
+
+    def reference(self, path):
+        return FakeReference(self, path)
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(firebase_cache.db, "reference", server.reference)
+    return server
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(firebase_cache.time, "monotonic", lambda: now[0])
+    return now
+
+def test_ttl_hit_does_not_touch_network(server, clock):
+    server.values["/a"] = ({"x": 1}, "e1")
+    cache = FirebaseReadCache(ttl=30)
+    assert cache.get("a") == {"x": 1}
+    clock[0] += 10
+    assert cache.get("/a/") == {"x": 1}
+    assert server.calls == [("get", "/a")]
+
+def test_unchanged_etag_returns_cached_data_and_refreshes(server, clock):
+    server.values["/a"] = ({"x": 1}, "e1")
+    cache = FirebaseReadCache(ttl=30)
+    first = cache.get("a")
+    clock[0] += 31
+    assert cache.get("a") is first
+    assert server.calls[-1] == ("get_if_changed", "/a")
+    assert cache._entries["/a"].stored_at == clock[0]
+
+    # بعد التحديث أصبح العنصر صالحاً من جديد فلا يُرسل طلب آخر
+    clock[0] += 10
+    cache.get("a")
+    assert len(server.calls) == 2
+
+def test_changed_etag_replaces_entry(server, clock):
+    server.values["/a"] = ({"x": 1}, "e1")
+    cache = FirebaseReadCache(ttl=30)
+    cache.get("a")
+    server.values["/a"] = ({"x": 2}, "e2")
+    clock[0] += 31
+    assert cache.get("a") == {"x": 2}
+    assert cache._entries["/a"].etag == "e2"
+
+def test_invalidate_evicts_path_ancestors_and_descendants(server):
+    for path in ("/", "/a", "/a/x", "/a/x/y", "/b", "/ab"):
+        server.values[path] = ({"p": path}, "e")
+    cache = FirebaseReadCache()
+    for path in ("/", "/a", "/a/x", "/a/x/y", "/b", "/ab"):
+        cache.get(path)
+    cache.invalidate("a/x")
+    assert sorted(cache._entries) == ["/ab", "/b"]
+    assert cache.total_bytes == sum(e.size for e in cache._entries.values())
+
+def test_eviction_keeps_total_under_limit(server):
+    for name in ("a", "b", "c"):
+        server.values[f"/{name}"] = ({"v": name * 10}, "e")
+    size = estimate_size({"v": "a" * 10})
+    cache = FirebaseReadCache(max_bytes=size * 2)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+    # b هو الأقل استخداماً مؤخراً
+    assert list(cache._entries) == ["/a", "/c"]
+    assert cache.total_bytes <= cache.max_bytes
+
+def test_oversized_value_is_not_stored(server):
+    server.values["/big"] = ({"v": "x" * 100}, "e")
+    cache = FirebaseReadCache(max_bytes=50)
+    assert cache.get("big") == {"v": "x" * 100}
+    assert "/big" not in cache._entries
+    assert cache.total_bytes == 0
+
+def test_fetch_invalidated_mid_flight_is_not_stored(server):
+    server.values["/a/b"] = ({"old": 1}, "e1")
+    cache = FirebaseReadCache()
+    server.before_response = lambda path: cache.invalidate("/a")
+    assert cache.get("a/b") == {"old": 1}
+    assert cache._entries == {}
+
+    server.before_response = lambda path: None
+    cache.get("a/b")
+    assert "/a/b" in cache._entries
+
+def test_inflight_tracking_is_released(server):
+    server.values["/a"] = ({"x": 1}, "e1")
+    cache = FirebaseReadCache()
+    cache.get("a")
+    cache.invalidate("a")
+    cache.clear()
+
+    def fail(path):
+        raise ConnectionError("offline")
+    server.before_response = fail
+    with pytest.raises(ConnectionError):
+        cache.get("b")
+    assert cache._inflight == {}
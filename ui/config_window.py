@@ -1,7 +1,7 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFormLayout,
     QLineEdit, QPushButton, QListWidget, QMessageBox,
-    QLabel, QGroupBox, QTextEdit
+    QLabel, QGroupBox, QTextEdit, QCheckBox
 )
 from PyQt5.QtCore import Qt, QDateTime, QThread, pyqtSignal
 from PyQt5.QtGui import QTextCursor
@@ -11,6 +11,7 @@ import pyodbc
 import firebase_admin
 from firebase_admin import credentials, db
 import tempfile
+from sync.firebase_cache import probe_connection
 
 class ConnectionCheckThread(QThread):
     result = pyqtSignal(bool, str)
@@ -62,6 +63,8 @@ class ConfigWindow(QWidget):
         self.db_form.addRow("🌐 المضيف:", self.host_input)
         self.db_form.addRow("👤 المستخدم:", self.user_input)
         self.db_form.addRow("🔐 كلمة المرور:", self.pass_input)
+        self.cdc_input = QCheckBox("مزامنة عند التغيير فقط (SQL Server CDC)")
+        self.db_form.addRow("👁️ CDC:", self.cdc_input)
 
         self.tables_group = QGroupBox("🔗 ربط الجداول المحلية بـ Firebase")
         self.tables_form = QFormLayout()
@@ -149,6 +152,7 @@ class ConfigWindow(QWidget):
             self.host_input.setText(db.get("host", ""))
             self.user_input.setText(db.get("username", ""))
             self.pass_input.setText(db.get("password", ""))
+            self.cdc_input.setChecked(bool(db.get("cdc", False)))
             for local, remote in db.get("tables", {}).items():
                 self.add_table_row(local, remote)
         except Exception:
@@ -156,6 +160,7 @@ class ConfigWindow(QWidget):
             self.host_input.clear()
             self.user_input.clear()
             self.pass_input.clear()
+            self.cdc_input.setChecked(False)
 
     def add_table_row(self, local_val="", remote_val=""):
         local_input = QLineEdit(str(local_val))
@@ -194,9 +199,11 @@ class ConfigWindow(QWidget):
                     "host": self.host_input.text(),
                     "username": self.user_input.text(),
                     "password": self.pass_input.text(),
-                    "tables": tables_dict
+                    "tables": tables_dict,
+                    "cdc": self.cdc_input.isChecked()
                 }
-                self.config["databases"][index] = db
+                # دمج مع الإدخال الحالي حتى لا تضيع مفاتيح غير معروضة في النموذج مثل capture_instances
+                self.config["databases"][index].update(db)
 
             self.config["firebase"] = {
                 key: inp.text().strip()
@@ -261,7 +268,8 @@ class ConfigWindow(QWidget):
             if not firebase_admin._apps:
                 cred = credentials.Certificate(tmp_path)
                 firebase_admin.initialize_app(cred, {"databaseURL": firebase_creds.get("database_url", "")})
-            db.reference("/").get()
+            # فحص خفيف بدل قراءة جذر القاعدة بالكامل
+            probe_connection()
             os.unlink(tmp_path)
             return True, "✅ اتصال Firebase ناجح"
         except Exception as e:
@@ -2,15 +2,52 @@ from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QLabel, QPushButton, QVBoxLayout,
     QTextEdit, QMenuBar, QAction, QMessageBox
 )
-from PyQt5.QtCore import Qt, QTimer, QDateTime
+from PyQt5.QtCore import Qt, QTimer, QDateTime, QThread, pyqtSignal
 from ui.config_window import ConfigWindow
 
 import os
 import json
 import traceback
+import pyodbc
 from sync.sql_reader import SQLReader
 from sync.firebase_writer import FirebaseWriter
 from sync.diff_checker import DiffChecker
+from sync.cdc_reader import CDCReader
+from sync.cdc_watcher import CDCWatcher, LSNCheckpointStore, default_capture_instance
+
+class ChangeWatcherThread(QThread):
+    changed = pyqtSignal(str, list, object)
+    status = pyqtSignal(str, bool, str)
+
+    def __init__(self, watchers, interval=0.5):
+        super().__init__()
+        self.watchers = watchers
+        self.interval = interval
+        self.failing = set()
+
+    def run(self):
+        while not self.isInterruptionRequested():
+            for watcher in self.watchers:
+                # قاعدة فشل فحصها تُتخطى حتى انتهاء مهلتها حتى لا تُبطئ بقية القواعد
+                if not watcher.poll_due():
+                    continue
+                try:
+                    tables, lsn = watcher.poll()
+                    if watcher.db_name in self.failing:
+                        self.failing.discard(watcher.db_name)
+                        self.status.emit(watcher.db_name, True, "")
+                    if tables:
+                        self.changed.emit(watcher.db_name, tables, lsn)
+                except Exception as e:
+                    if isinstance(e, pyodbc.Error):
+                        watcher.reader.close()
+                    # الإبلاغ عن الفشل مرة واحدة فقط حتى لا يمتلئ السجل
+                    if watcher.db_name not in self.failing:
+                        self.failing.add(watcher.db_name)
+                        self.status.emit(watcher.db_name, False, str(e))
+            self.msleep(int(self.interval * 1000))
+        for watcher in self.watchers:
+            watcher.reader.close()
 
 class MainWindow(QMainWindow):
     def __init__(self, config=None, logger=None):
@@ -77,6 +114,76 @@ class MainWindow(QMainWindow):
         self.diff_checker = DiffChecker()
         self.last_data = {}
 
+        # قواعد CDC تُزامن عند حدوث تغيير فقط، وتعود للمؤقت إذا تعذّر قراءة CDC
+        self.cdc_watchers = {}
+        self.cdc_fallback = set()
+        self.cdc_thread = None
+        self.start_cdc_watcher()
+
+    def start_cdc_watcher(self):
+        checkpoints = LSNCheckpointStore()
+        for db_conf in self.config.get("databases", []):
+            if not db_conf.get("cdc"):
+                continue
+            db_name = db_conf.get("name")
+            overrides = db_conf.get("capture_instances", {})
+            capture_instances = {
+                table: overrides.get(table, default_capture_instance(table))
+                for table in db_conf.get("tables", {})
+            }
+            reader = CDCReader(db_name, db_conf.get("host"), db_conf.get("username"), db_conf.get("password"))
+            self.cdc_watchers[db_name] = CDCWatcher(db_name, reader, capture_instances, checkpoints)
+
+        if self.cdc_watchers:
+            interval = self.config.get("cdc_poll_interval", 0.5)
+            self.cdc_thread = ChangeWatcherThread(list(self.cdc_watchers.values()), interval)
+            self.cdc_thread.changed.connect(self.on_cdc_changes)
+            self.cdc_thread.status.connect(self.on_cdc_status)
+            self.cdc_thread.start()
+            self.append_log(f"👁️ مراقبة CDC مفعّلة لـ {len(self.cdc_watchers)} قاعدة.")
+
+    def on_cdc_status(self, db_name, ok, message):
+        if ok:
+            self.cdc_fallback.discard(db_name)
+            self.append_log(f"✅ قاعدة [{db_name}]: عادت مراقبة CDC للعمل.")
+        else:
+            self.cdc_fallback.add(db_name)
+            self.append_log(f"⚠️ قاعدة [{db_name}]: فشل قراءة CDC ({message})، سيتم استخدام المزامنة الدورية.")
+
+    def on_cdc_changes(self, db_name, tables, lsn):
+        watcher = self.cdc_watchers[db_name]
+        db_conf = next((d for d in self.config.get("databases", []) if d.get("name") == db_name), None)
+        if not self.firebase_writer or db_conf is None:
+            for local_table in tables:
+                watcher.fail(local_table)
+            return
+
+        total_changes = 0
+        sql_reader = SQLReader(db_name, db_conf.get("host"), db_conf.get("username"), db_conf.get("password"))
+        remote_tables = db_conf.get("tables", {})
+        for local_table in tables:
+            try:
+                ok, count = self.sync_table(sql_reader, db_name, local_table, remote_tables[local_table])
+            except Exception as e:
+                ok, count = False, 0
+                self.append_log(f"❌ خطأ أثناء مزامنة CDC: {e}")
+                if self.logger:
+                    self.logger.error(f"خطأ أثناء مزامنة CDC: {e}")
+            if ok:
+                watcher.commit(local_table, lsn)
+                total_changes += count
+            else:
+                watcher.fail(local_table)
+
+        self.last_sync_label.setText("آخر مزامنة: الآن")
+        self.records_label.setText(f"عدد التغييرات: {total_changes}")
+
+    def closeEvent(self, event):
+        if self.cdc_thread:
+            self.cdc_thread.requestInterruption()
+            self.cdc_thread.wait()
+        super().closeEvent(event)
+
     def update_time(self):
         now = QDateTime.currentDateTime().toString("yyyy-MM-dd hh:mm:ss")
         self.statusBar().showMessage(f"الوقت الحالي: {now}")
@@ -88,6 +195,16 @@ class MainWindow(QMainWindow):
         self.sync_data(is_manual=False)
 
     def sync_data(self, is_manual=False):
+        db_configs = self.config.get("databases", [])
+        if not is_manual:
+            # قواعد CDC تُزامن عند التغيير فقط، فالمؤقت يخدم البقية وقواعد CDC المتعطلة
+            db_configs = [
+                d for d in db_configs
+                if d.get("name") not in self.cdc_watchers or d.get("name") in self.cdc_fallback
+            ]
+            if not db_configs and self.cdc_watchers:
+                return
+
         if is_manual:
             self.append_log("بدأت عملية المزامنة اليدوية...")
             if self.logger:
@@ -97,7 +214,6 @@ class MainWindow(QMainWindow):
 
         total_changes = 0
         try:
-            db_configs = self.config.get("databases", [])
             if not db_configs:
                 self.append_log("لم يتم العثور على قواعد بيانات في الإعدادات.")
                 return
@@ -115,30 +231,8 @@ class MainWindow(QMainWindow):
 
                 sql_reader = SQLReader(db_name, db_host, db_user, db_pass)
                 for local_table, remote_table in tables.items():
-                    query = f"SELECT * FROM {local_table}"
-                    new_data = sql_reader.fetch_query(query)
-                    key = f"{db_name}:{local_table}"
-
-                    if not new_data:
-                        self.append_log(f"⚠️ قاعدة [{db_name}] - جدول [{local_table}]: الجدول غير موجود أو فارغ.")
-                        continue
-
-                    old_data = self.last_data.get(key, [])
-                    diff = self.diff_checker.compare_lists(old_data, new_data)
-                    changes = diff["added"] + [u["after"] for u in diff["updated"]]
-
-                    if changes:
-                        path = f"{remote_table}/{db_name}"
-                        success = self.firebase_writer.write_data(path, {str(i): row for i, row in enumerate(new_data)})
-                        if success:
-                            self.append_log(f"📤 قاعدة [{db_name}] - جدول [{local_table}]: تم رفع {len(changes)} سجل إلى [{remote_table}] ✅")
-                            total_changes += len(changes)
-                        else:
-                            self.append_log(f"❌ قاعدة [{db_name}] - جدول [{local_table}]: فشل رفع البيانات إلى Firebase.")
-                    else:
-                        self.append_log(f"🟡 قاعدة [{db_name}] - جدول [{local_table}]: لا يوجد بيانات جديدة للرفع.")
-
-                    self.last_data[key] = new_data
+                    _, count = self.sync_table(sql_reader, db_name, local_table, remote_table)
+                    total_changes += count
 
             self.last_sync_label.setText("آخر مزامنة: الآن")
             self.records_label.setText(f"عدد التغييرات: {total_changes}")
@@ -156,6 +250,37 @@ class MainWindow(QMainWindow):
             if self.logger:
                 self.logger.error(f"خطأ أثناء المزامنة: {e}")
 
+    def sync_table(self, sql_reader, db_name, local_table, remote_table):
+        """تشغيل خط المزامنة لجدول واحد. يرجع (نجاح العملية، عدد التغييرات)."""
+        query = f"SELECT * FROM {local_table}"
+        try:
+            new_data = sql_reader.fetch_query(query, raise_errors=True)
+        except Exception as e:
+            self.append_log(f"❌ قاعدة [{db_name}] - جدول [{local_table}]: فشل قراءة الجدول: {e}")
+            return False, 0
+        key = f"{db_name}:{local_table}"
+
+        if not new_data:
+            self.append_log(f"⚠️ قاعدة [{db_name}] - جدول [{local_table}]: الجدول فارغ.")
+            return True, 0
+
+        old_data = self.last_data.get(key, [])
+        diff = self.diff_checker.compare_lists(old_data, new_data)
+        changes = diff["added"] + [u["after"] for u in diff["updated"]]
+
+        if changes:
+            path = f"{remote_table}/{db_name}"
+            success = self.firebase_writer.write_data(path, {str(i): row for i, row in enumerate(new_data)})
+            if not success:
+                self.append_log(f"❌ قاعدة [{db_name}] - جدول [{local_table}]: فشل رفع البيانات إلى Firebase.")
+                return False, 0
+            self.append_log(f"📤 قاعدة [{db_name}] - جدول [{local_table}]: تم رفع {len(changes)} سجل إلى [{remote_table}] ✅")
+        else:
+            self.append_log(f"🟡 قاعدة [{db_name}] - جدول [{local_table}]: لا يوجد بيانات جديدة للرفع.")
+
+        self.last_data[key] = new_data
+        return True, len(changes)
+
     def append_log(self, message):
         timestamp = QDateTime.currentDateTime().toString('hh:mm:ss')
         self.log_area.append(f"[{timestamp}] {message}")